@@ -1,29 +1,90 @@
 import os
-import json
-import re # Usaremos regex para analizar la respuesta de Gemini
-from fastapi import FastAPI, HTTPException
+import orjson
+import asyncio
+import datetime
+import string
+import math
+import time
+import hashlib
+from contextlib import asynccontextmanager
+import numpy as np
+import hnswlib
+import ijson
+import redis.asyncio as redis
+import tenacity
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.routing import APIRoute
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 import google.generativeai as genai
+from google.generativeai import caching
+from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable
 
 # --- 1. Configuración Inicial ---
 #uvicorn main:app --reload, armar enviroment, requirements
+# Producción: python main.py (varios workers con uvloop/httptools, ver el final del archivo)
 
 # Carga la variable de entorno (GOOGLE_API_KEY) desde el archivo .env
 load_dotenv()
 
+# Usamos orjson (implementado en C) tanto para leer el cuerpo de las solicitudes
+# como para serializar las respuestas
+class ORJSONRequest(Request):
+    async def json(self):
+        if not hasattr(self, "_json"):
+            self._json = orjson.loads(await self.body())
+        return self._json
+
+
+class ORJSONRoute(APIRoute):
+    def get_route_handler(self):
+        original_route_handler = super().get_route_handler()
+
+        async def custom_route_handler(request: Request):
+            return await original_route_handler(ORJSONRequest(request.scope, request.receive))
+
+        return custom_route_handler
+
+
+# Respuesta propia en vez de fastapi.responses.ORJSONResponse, que FastAPI marcó como
+# obsoleta a partir de la 0.131 (y avisa con FastAPIDeprecationWarning al crearla)
+class ORJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # El modelo (y la caché de contexto) se crean al iniciar cada worker, no al importar
+    # el módulo: así el proceso supervisor de uvicorn no hace llamadas a Gemini.
+    # Son llamadas bloqueantes, por eso se ejecutan en un hilo.
+    await asyncio.to_thread(iniciar_modelo)
+    tarea_cache = asyncio.create_task(mantener_cache_contexto())
+    yield
+    tarea_cache.cancel()
+    await asyncio.to_thread(cerrar_modelo)
+
+
 # Inicializa la API de FastAPI
 app = FastAPI(
     title="API de Asistente de Decisión Clínica (Sepsis)",
     description="Una API que analiza datos de pacientes para detectar riesgo de sepsis usando Gemini.",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
+app.router.route_class = ORJSONRoute
 
 # Configura la API Key de Gemini desde la variable de entorno
 try:
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
         raise ValueError("No se encontró la GOOGLE_API_KEY en las variables de entorno.")
+    # Se deja el transporte por defecto (gRPC): cada cliente abre un único canal HTTP/2
+    # persistente y multiplexa todas las llamadas concurrentes sobre él, sin un handshake
+    # TLS por solicitud. Forzar transport="grpc_asyncio" o "rest" rompería los clientes
+    # síncronos o asíncronos respectivamente, porque la librería usa ambos.
     genai.configure(api_key=api_key)
 except Exception as e:
     print(f"Error al configurar Gemini: {e}")
@@ -33,20 +94,20 @@ except Exception as e:
 # Esto valida automáticamente los datos que llegan a tu API
 
 class PatientData(BaseModel):
-    frecuencia_cardiaca: int = Field(..., example=125)
-    presion_arterial: str = Field(..., example="85/45")
-    frecuencia_respiratoria: int = Field(..., example=28)
-    temperatura_corporal: float = Field(..., example=39.1)
-    saturacion_oxigeno: int = Field(..., example=89)
-    procalcitonina: float = Field(..., example=4.5)
-    lactato: float = Field(..., example=3.1)
-    pcr: float = Field(..., example=210.0)
-    leucocitos: float = Field(..., example=18.2)
-    array_json_comorbilidades: list[str] = Field(..., example=["EPOC", "Hipertensión"])
-    texto_patologias_presentes: str = Field(..., example="Neumonía Adquirida en la Comunidad (NAC)")
-    texto_sintomas_diarios: str = Field(..., example="Confusión aguda, disnea severa.")
-    objeto_json_valores_previos: dict = Field(..., example={"lactato_previo": 1.1, "pa_previa": "110/70"})
-    porcentaje_ia: int = Field(..., example=85)
+    frecuencia_cardiaca: int = Field(..., json_schema_extra={"example": 125})
+    presion_arterial: str = Field(..., json_schema_extra={"example": "85/45"})
+    frecuencia_respiratoria: int = Field(..., json_schema_extra={"example": 28})
+    temperatura_corporal: float = Field(..., json_schema_extra={"example": 39.1})
+    saturacion_oxigeno: int = Field(..., json_schema_extra={"example": 89})
+    procalcitonina: float = Field(..., json_schema_extra={"example": 4.5})
+    lactato: float = Field(..., json_schema_extra={"example": 3.1})
+    pcr: float = Field(..., json_schema_extra={"example": 210.0})
+    leucocitos: float = Field(..., json_schema_extra={"example": 18.2})
+    array_json_comorbilidades: list[str] = Field(..., json_schema_extra={"example": ["EPOC", "Hipertensión"]})
+    texto_patologias_presentes: str = Field(..., json_schema_extra={"example": "Neumonía Adquirida en la Comunidad (NAC)"})
+    texto_sintomas_diarios: str = Field(..., json_schema_extra={"example": "Confusión aguda, disnea severa."})
+    objeto_json_valores_previos: dict = Field(..., json_schema_extra={"example": {"lactato_previo": 1.1, "pa_previa": "110/70"}})
+    porcentaje_ia: int = Field(..., json_schema_extra={"example": 85})
 
 class AnalysisResponse(BaseModel):
     analisis_breve: str
@@ -55,51 +116,63 @@ class AnalysisResponse(BaseModel):
 
 # --- 3. Lógica de Gemini---
 
-# La plantilla de prompt
-prompt_base = """### ROL Y OBJETIVO ###
+# La plantilla de prompt se divide en dos partes:
+# - PROMPT_PREFIX: rol, contexto, instrucciones y formato. Es idéntico en todas las
+#   solicitudes, así que se registra una sola vez como caché de contexto en Gemini.
+# - PROMPT_SUFFIX_TEMPLATE: sólo los datos del paciente, que van al FINAL del prompt
+#   para no romper el prefijo cacheado. Van en formato compacto (las abreviaturas se
+#   explican una sola vez en el prefijo) para pagar menos tokens por solicitud.
+PROMPT_PREFIX = """### ROL Y OBJETIVO ###
 Actúa como un médico experto en cuidados intensivos y soporte de decisiones clínicas, especializado en la detección temprana de sepsis. Tu propósito es asistir a médicos y enfermeras calificados en un entorno de paciente internado.
 
 ### CONTEXTO ###
 Estás analizando los datos de un paciente para identificar el riesgo de sepsis o shock séptico. Un modelo de IA interno (de la aplicación) ha proporcionado una puntuación de riesgo preliminar. Tu tarea es analizar la totalidad de los datos (clínicos, laboratorio, tendencias y comorbilidades) para proveer un análisis accionable e integrado.
 
-### DATOS DEL PACIENTE ###
-Analiza los siguientes datos. Presta especial atención a las combinaciones y tendencias que sugieran disfunción orgánica múltiple.
-
-**1. Datos Actuales (Signos Vitales y Laboratorio Estándar):**
-* Frecuencia Cardíaca: {FRECUENCIA_CARDIACA} (lat/min)
-* Presión Arterial (Sistólica/Media): {PRESION_ARTERIAL} (mmHg)
-* Frecuencia Respiratoria: {FRECUENCIA_RESPIRATORIA} (resp/min)
-* Temperatura Corporal: {TEMPERATURA_CORPORAL} (°C)
-* Saturación de Oxígeno (SpO2): {SATURACION_OXIGENO} (%)
-* Procalcitonina (PCT): {PROCALCITONINA} (ng/mL)
-* Lactato: {LACTATO} (mmol/L)
-* Proteína C Reactiva (PCR): {PCR} (mg/L)
-* Leucocitos: {LEUCOCITOS} (x10^9/L)
-
-**2. Historial y Contexto (Formato Estructurado):**
-* Comorbilidades Conocidas (Array JSON): {ARRAY_JSON_COMORBILIDADES}
-* Patologías Presentes (String): "{TEXTO_PATOLOGIAS_PRESENTES}"
-* Síntomas Diarios Reportados (String): "{TEXTO_SINTOMAS_DIARIOS}"
-
-**3. Datos de Tendencia y Modelo Interno:**
-* Valores Previos (Objeto JSON): {OBJETO_JSON_VALORES_PREVIOS}
-* Puntuación de Riesgo de Sepsis (Modelo IA Interno): {PORCENTAJE_IA}%
+### FORMATO DE LOS DATOS DEL PACIENTE ###
+Los datos del paciente llegan al final, en formato compacto:
+* Vitales: HR=Frecuencia Cardíaca (lat/min), BP=Presión Arterial Sistólica/Media (mmHg), RR=Frecuencia Respiratoria (resp/min), T=Temperatura Corporal (°C), SpO2=Saturación de Oxígeno (%), PCT=Procalcitonina (ng/mL), LAC=Lactato (mmol/L), PCR=Proteína C Reactiva (mg/L), WBC=Leucocitos (x10^9/L).
+* Comorbilidades: array JSON con las comorbilidades conocidas.
+* Patologías: patologías presentes (texto libre).
+* Síntomas: síntomas diarios reportados (texto libre).
+* Previos: objeto JSON con valores previos, para evaluar tendencias.
+* IA: puntuación de riesgo de sepsis del modelo de IA interno.
+Presta especial atención a las combinaciones y tendencias que sugieran disfunción orgánica múltiple.
 
 ### INSTRUCCIONES DE ANÁLIS... (etc.) ...###
 
 ### FORMATO DE RESPUESTA OBLIGATORIO ###
-Proporciona tu respuesta estrictamente en el siguiente formato de 3 secciones, respetando los límites de líneas:
-
-**1. Análisis Breve:**
-(Resumen conciso del estado y riesgo. **MÁXIMO 2 LÍNEAS.**)
+Responde únicamente con un objeto JSON con estas 3 claves, respetando los límites de líneas:
 
-**2. Justificación:**
-(Explicación concisa. Enfocarse *solo* en los 2-3 factores críticos (ej. "Hipotensión + Lactato elevado") que justifican el análisis. **MÁXIMO 5 LÍNEAS.**)
+* "analisis_breve": Resumen conciso del estado y riesgo. **MÁXIMO 2 LÍNEAS.**
+* "justificacion": Explicación concisa. Enfocarse *solo* en los 2-3 factores críticos (ej. "Hipotensión + Lactato elevado") que justifican el análisis. **MÁXIMO 5 LÍNEAS.**
+* "acciones_sugeridas": Lista de 3-4 acciones *más urgentes* y priorizadas. Sin explicaciones. **MÁXIMO 5 LÍNEAS en total para este campo.**
+"""
 
-**3. Acciones Sugeridas:**
-(Lista de 3-4 acciones *más urgentes* y priorizadas. Sin explicaciones. **MÁXIMO 5 LÍNEAS en total para esta sección.**)
+PROMPT_SUFFIX_TEMPLATE = """### DATOS DEL PACIENTE ###
+Vitales: HR={FRECUENCIA_CARDIACA},BP={PRESION_ARTERIAL},RR={FRECUENCIA_RESPIRATORIA},T={TEMPERATURA_CORPORAL},SpO2={SATURACION_OXIGENO},PCT={PROCALCITONINA},LAC={LACTATO},PCR={PCR},WBC={LEUCOCITOS}
+Comorbilidades: {ARRAY_JSON_COMORBILIDADES}
+Patologías: "{TEXTO_PATOLOGIAS_PRESENTES}"
+Síntomas: "{TEXTO_SINTOMAS_DIARIOS}"
+Previos: {OBJETO_JSON_VALORES_PREVIOS}
+IA: {PORCENTAJE_IA}%
 """
 
+
+def _compilar_plantilla(plantilla: str):
+    """
+    Parsea una plantilla estilo str.format una sola vez y devuelve una función que
+    sólo concatena los fragmentos con los valores (no admite especificadores de formato).
+    """
+    partes = [(literal, campo) for literal, campo, _, _ in string.Formatter().parse(plantilla)]
+
+    def render(**valores) -> str:
+        return "".join(literal if campo is None else literal + str(valores[campo]) for literal, campo in partes)
+
+    return render
+
+
+render_prompt_suffix = _compilar_plantilla(PROMPT_SUFFIX_TEMPLATE)
+
 # Configuraciones de Gemini
 safety_settings_config = [
     {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
@@ -107,95 +180,740 @@ safety_settings_config = [
     {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
     {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
 ]
+# El esquema de respuesta es chico: con 512 tokens de salida alcanza de sobra y se
+# acota la latencia del peor caso (el presupuesto del decodificador es proporcional).
+# En modo JSON la generación termina al cerrar el objeto, así que no hacen falta stop_sequences.
+MAX_OUTPUT_TOKENS = 512
+
+# Gemini devuelve JSON estructurado según este esquema, así que no hace falta parsear Markdown
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "analisis_breve": {"type": "string"},
+        "justificacion": {"type": "string"},
+        "acciones_sugeridas": {"type": "string"},
+    },
+    "required": ["analisis_breve", "justificacion", "acciones_sugeridas"],
+}
 generation_config = genai.GenerationConfig(
     temperature=0.2,
-    max_output_tokens=4096 
+    max_output_tokens=MAX_OUTPUT_TOKENS,
+    response_mime_type="application/json",
+    response_schema=ANALYSIS_SCHEMA
 )
 
-# Inicializa el modelo
-model = genai.GenerativeModel('gemini-2.0-flash')
+# Límite global de llamadas simultáneas a Gemini (por proceso); conviene ajustarlo
+# a la cuota de solicitudes por minuto contratada
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "32"))
+GEMINI_SEM = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+
+# Modelo de Gemini. El modelo y las configuraciones se crean una sola vez por worker
+# (en iniciar_modelo, llamado desde el lifespan de la app) y se reutilizan en todas
+# las solicitudes; no instanciarlos por solicitud.
+# Se intenta registrar PROMPT_PREFIX como caché de contexto explícita; si Gemini lo rechaza
+# (ej. el prefijo no alcanza el mínimo de tokens cacheables) se usa como system_instruction,
+# que igualmente aprovecha la caché implícita de prefijos de Gemini.
+# Cada worker crea su propia caché explícita: con N workers se paga N veces el
+# almacenamiento del prefijo (es chico, y así cada worker la renueva y borra por su cuenta).
+GEMINI_MODEL = "models/gemini-2.0-flash-001"
+CONTEXT_CACHE_TTL = datetime.timedelta(hours=1)
+# Cada cuánto se renueva la caché en segundo plano (bastante antes de que expire)
+CONTEXT_CACHE_RENOVACION = CONTEXT_CACHE_TTL / 4
+# Mínimo de tokens que Gemini acepta en una caché de contexto explícita para este modelo
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "4096"))
+
+PREFIX_TOKENS = None
+context_cache = None
+model = None
+
+
+def iniciar_modelo():
+    global PREFIX_TOKENS, context_cache, model
+
+    # Tokens del prefijo fijo, contados una sola vez al iniciar (None si no se pudo contar).
+    # Si el prefijo no llega al mínimo cacheable, no se intenta crear la caché explícita:
+    # Gemini la rechazaría y sólo sumaría otra llamada bloqueante al arranque.
+    try:
+        PREFIX_TOKENS = genai.GenerativeModel(GEMINI_MODEL).count_tokens(PROMPT_PREFIX).total_tokens
+    except Exception as e:
+        print(f"No se pudieron contar los tokens del prefijo: {e}")
 
-# --- 4. Parseo ---
+    if PREFIX_TOKENS is not None and PREFIX_TOKENS < CONTEXT_CACHE_MIN_TOKENS:
+        print(f"Prefijo de {PREFIX_TOKENS} tokens (mínimo cacheable: {CONTEXT_CACHE_MIN_TOKENS}), se usa system_instruction")
+        model = genai.GenerativeModel(GEMINI_MODEL, system_instruction=PROMPT_PREFIX)
+        return
 
-def parse_gemini_response(text: str) -> dict:
+    _crear_modelo_cacheado()
+
+
+def _crear_modelo_cacheado():
     """
-    Analiza la respuesta de texto de Gemini y la divide en un dict estructurado.
+    Crea la caché de contexto y el modelo que la usa. Si no se puede, se usa el
+    modelo con system_instruction.
     """
+    global context_cache, model
     try:
-        # Usamos regex para encontrar el contenido después de cada título
-        # re.DOTALL significa que . también incluye saltos de línea
-        
-        analisis = re.search(r"\*\*1\. Análisis Breve:\*\*(.*?)(?=\*\*2\. Justificación:\*\*|\Z)", text, re.DOTALL | re.IGNORECASE)
-        justificacion = re.search(r"\*\*2\. Justificación:\*\*(.*?)(?=\*\*3\. Acciones Sugeridas:\*\*|\Z)", text, re.DOTALL | re.IGNORECASE)
-        acciones = re.search(r"\*\*3\. Acciones Sugeridas:\*\*(.*)", text, re.DOTALL | re.IGNORECASE)
-
-        # Limpiamos el texto (quitamos espacios, saltos de línea y texto de placeholder)
-        clean_analisis = analisis.group(1).strip().strip("()").strip() if analisis else "No se pudo parsear el análisis."
-        clean_justificacion = justificacion.group(1).strip().strip("()").strip() if justificacion else "No se pudo parsear la justificación."
-        clean_acciones = acciones.group(1).strip().strip("()").strip() if acciones else "No se pudieron parsear las acciones."
-
-        return {
-            "analisis_breve": clean_analisis,
-            "justificacion": clean_justificacion,
-            "acciones_sugeridas": clean_acciones
-        }
+        nueva_cache = caching.CachedContent.create(
+            model=GEMINI_MODEL,
+            system_instruction=PROMPT_PREFIX,
+            ttl=CONTEXT_CACHE_TTL
+        )
+        model = genai.GenerativeModel.from_cached_content(nueva_cache)
+        context_cache = nueva_cache
     except Exception as e:
-        print(f"Error al parsear la respuesta: {e}")
-        # Devuelve el texto en bruto si falla el parseo
-        return {
-            "analisis_breve": text,
-            "justificacion": "Error de parseo.",
-            "acciones_sugeridas": "Error de parseo."
-        }
+        print(f"No se pudo crear la caché de contexto, se usa el modelo sin caché explícita: {e}")
+        context_cache = None
+        model = genai.GenerativeModel(GEMINI_MODEL, system_instruction=PROMPT_PREFIX)
+
 
+def cerrar_modelo():
+    # Se borra la caché de contexto al apagar el worker, para no seguir pagándola hasta que expire
+    if context_cache is not None:
+        try:
+            context_cache.delete()
+        except Exception as e:
+            print(f"Error al borrar la caché de contexto: {e}")
 
-# --- 5. El Endpoint de la API ---
 
-@app.post("/analyze", response_model=AnalysisResponse)
-async def analyze_patient_endpoint(data: PatientData):
+def renovar_cache_contexto():
     """
-    Recibe los datos de un paciente, construye el prompt,
-    llama a la API de Gemini y devuelve un análisis estructurado.
+    Extiende el TTL de la caché de contexto. Si la renovación falla (ej. la caché ya
+    expiró en Google), se crea una nueva o se vuelve al modelo con system_instruction,
+    para que el modelo nunca quede apuntando a una caché inexistente.
     """
+    if context_cache is None:
+        return
     try:
-        # Formatear las variables estructuradas
-        comorbilidades_formateada = json.dumps(data.array_json_comorbilidades, indent=2, ensure_ascii=False)
-        valores_previos_formateados = json.dumps(data.objeto_json_valores_previos, indent=2, ensure_ascii=False)
-
-        # Rellenar la plantilla del prompt
-        prompt_final = prompt_base.format(
-            FRECUENCIA_CARDIACA=data.frecuencia_cardiaca,
-            PRESION_ARTERIAL=data.presion_arterial,
-            FRECUENCIA_RESPIRATORIA=data.frecuencia_respiratoria,
-            TEMPERATURA_CORPORAL=data.temperatura_corporal,
-            SATURACION_OXIGENO=data.saturacion_oxigeno,
-            PROCALCITONINA=data.procalcitonina,
-            LACTATO=data.lactato,
-            PCR=data.pcr,
-            LEUCOCITOS=data.leucocitos,
-            ARRAY_JSON_COMORBILIDADES=comorbilidades_formateada,
-            TEXTO_PATOLOGIAS_PRESENTES=data.texto_patologias_presentes,
-            TEXTO_SINTOMAS_DIARIOS=data.texto_sintomas_diarios,
-            OBJETO_JSON_VALORES_PREVIOS=valores_previos_formateados,
-            PORCENTAJE_IA=data.porcentaje_ia
-        )
+        context_cache.update(ttl=CONTEXT_CACHE_TTL)
+    except Exception as e:
+        print(f"Error al renovar la caché de contexto, se crea una nueva: {e}")
+        _crear_modelo_cacheado()
 
-        # Llamar a Gemini
-        response = model.generate_content(
-            prompt_final,
-            generation_config=generation_config,
+
+async def mantener_cache_contexto():
+    # Tarea de fondo (una por worker, iniciada en el lifespan): renueva la caché
+    # periódicamente aunque el worker no reciba solicitudes
+    while True:
+        await asyncio.sleep(CONTEXT_CACHE_RENOVACION.total_seconds())
+        await asyncio.to_thread(renovar_cache_contexto)
+
+
+# Reintentos con backoff exponencial y jitter ante errores transitorios de Gemini
+# (429 por cuota y 503), en lugar de devolverle un 500 al cliente
+gemini_retry = tenacity.retry(
+    retry=tenacity.retry_if_exception_type((ResourceExhausted, ServiceUnavailable)),
+    wait=tenacity.wait_random_exponential(min=0.2, max=8),
+    stop=tenacity.stop_after_attempt(4),
+    reraise=True
+)
+
+
+@gemini_retry
+async def llamar_gemini(contenido, config=generation_config):
+    """
+    Llama a Gemini (versión async: no bloquea el event loop mientras esperamos la red)
+    respetando el límite de concurrencia GEMINI_MAX_CONCURRENCY.
+    La espera entre reintentos ocurre fuera del semáforo, liberando el lugar para otras solicitudes.
+    """
+    async with GEMINI_SEM:
+        return await model.generate_content_async(
+            contenido,
+            generation_config=config,
             safety_settings=safety_settings_config
         )
 
-        # Analizar (parsear) la respuesta
-        parsed_response = parse_gemini_response(response.text)
-        
-        return parsed_response
+# --- 4. Caché Semántica ---
+# Si llega un paciente prácticamente idéntico a uno analizado hace poco,
+# devolvemos el análisis guardado en lugar de volver a llamar a Gemini.
+
+EMBEDDING_MODEL = "models/text-embedding-004"
+EMBEDDING_DIM = 768
+CACHE_SIMILITUD_MIN = float(os.getenv("CACHE_SIMILITUD_MIN", "0.95"))
+CACHE_TTL_SEGUNDOS = int(os.getenv("CACHE_TTL_SEGUNDOS", "900"))
+CACHE_MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", "10000"))
+
+
+def _redondear(valor: float, paso: float) -> float:
+    # Redondea al múltiplo de `paso` más cercano, con los empates siempre hacia arriba
+    # (round() redondea al par y deja intervalos de distinto ancho) y sin arrastrar
+    # errores de punto flotante
+    return round(math.floor(round(valor / paso, 9) + 0.5) * paso, 2)
+
+
+def _normalizar_texto(texto: str) -> str:
+    return " ".join(texto.lower().split())
+
+
+def bin_vitals(d: PatientData) -> PatientData:
+    """
+    Devuelve una copia del paciente con las vitales redondeadas a intervalos clínicamente
+    equivalentes y los textos normalizados, para que variaciones mínimas (ej. FC 124 vs 125)
+    caigan en la misma clave de caché. Sólo se usa para la caché: Gemini recibe los valores reales.
+    """
+    return d.model_copy(update={
+        "frecuencia_cardiaca": _redondear(d.frecuencia_cardiaca, 5),
+        "presion_arterial": "".join(d.presion_arterial.split()),
+        "frecuencia_respiratoria": _redondear(d.frecuencia_respiratoria, 2),
+        "temperatura_corporal": _redondear(d.temperatura_corporal, 0.1),
+        "procalcitonina": _redondear(d.procalcitonina, 0.1),
+        "lactato": _redondear(d.lactato, 0.1),
+        "pcr": _redondear(d.pcr, 10),
+        "leucocitos": _redondear(d.leucocitos, 0.5),
+        "array_json_comorbilidades": sorted(_normalizar_texto(c) for c in d.array_json_comorbilidades),
+        "texto_patologias_presentes": _normalizar_texto(d.texto_patologias_presentes),
+        "texto_sintomas_diarios": _normalizar_texto(d.texto_sintomas_diarios),
+    })
+
+
+def patient_key(d: PatientData) -> str:
+    """
+    Construye un resumen canónico del paciente, que ya debe venir agrupado con
+    bin_vitals, para usarlo como clave de caché.
+    """
+    partes = [
+        f"FC={d.frecuencia_cardiaca}",
+        f"PA={d.presion_arterial}",
+        f"FR={d.frecuencia_respiratoria}",
+        f"T={d.temperatura_corporal}",
+        f"SpO2={d.saturacion_oxigeno}",
+        f"PCT={d.procalcitonina}",
+        f"LAC={d.lactato}",
+        f"PCR={d.pcr}",
+        f"LEU={d.leucocitos}",
+        "COMORBILIDADES=" + ",".join(d.array_json_comorbilidades),
+        "PATOLOGIAS=" + d.texto_patologias_presentes,
+        "SINTOMAS=" + d.texto_sintomas_diarios,
+        "PREVIOS=" + orjson.dumps(d.objeto_json_valores_previos, option=orjson.OPT_SORT_KEYS).decode(),
+        f"IA={d.porcentaje_ia}",
+    ]
+    return "|".join(partes)
+
+
+def campos_criticos(d: PatientData) -> tuple:
+    """
+    Vitales y laboratorio (de un paciente ya agrupado con bin_vitals) más la puntuación
+    del modelo interno. El embedding de la clave no distingue bien entre números (ej.
+    LAC=1.1 vs LAC=4.1), así que un acierto semántico sólo se acepta si todos estos
+    coinciden exactamente.
+    """
+    return (
+        d.frecuencia_cardiaca,
+        d.presion_arterial,
+        d.frecuencia_respiratoria,
+        d.temperatura_corporal,
+        d.saturacion_oxigeno,
+        d.procalcitonina,
+        d.lactato,
+        d.pcr,
+        d.leucocitos,
+        d.porcentaje_ia,
+    )
+
+
+def claves_cache(data: PatientData) -> tuple[str, tuple]:
+    """
+    Agrupa el paciente una sola vez y devuelve (clave de caché, campos críticos).
+    """
+    agrupado = bin_vitals(data)
+    return patient_key(agrupado), campos_criticos(agrupado)
+
+
+async def embed_patient(clave: str):
+    """
+    Obtiene el embedding de la clave del paciente. Devuelve None si falla,
+    en cuyo caso simplemente no se usa la caché.
+    """
+    try:
+        resultado = await genai.embed_content_async(
+            model=EMBEDDING_MODEL,
+            content=clave,
+            task_type="semantic_similarity"
+        )
+        return np.asarray(resultado["embedding"], dtype=np.float32)
+    except Exception as e:
+        print(f"Error al obtener el embedding: {e}")
+        return None
+
+
+class SemanticCache:
+    """
+    Índice HNSW (similitud coseno) en memoria: embedding del paciente -> análisis.
+    Cada entrada expira a los `ttl` segundos.
+    """
+
+    def __init__(self, dim: int, max_entradas: int, similitud_min: float, ttl: int):
+        self.index = hnswlib.Index(space="cosine", dim=dim)
+        self.index.init_index(max_elements=max_entradas, ef_construction=200, M=16, allow_replace_deleted=True)
+        self.index.set_ef(50)
+        self.max_entradas = max_entradas
+        self.similitud_min = similitud_min
+        self.ttl = ttl
+        self.entradas = {}  # id -> (análisis, campos críticos, momento de creación)
+        self.siguiente_id = 0
+
+    def _eliminar(self, id_entrada: int):
+        self.index.mark_deleted(id_entrada)
+        del self.entradas[id_entrada]
+
+    def _purgar(self):
+        ahora = time.monotonic()
+        for id_entrada, (_, _, creado) in list(self.entradas.items()):
+            if ahora - creado > self.ttl:
+                self._eliminar(id_entrada)
+        # Si sigue lleno, descartamos la entrada más antigua
+        if len(self.entradas) >= self.max_entradas:
+            mas_antigua = min(self.entradas, key=lambda i: self.entradas[i][2])
+            self._eliminar(mas_antigua)
+
+    def buscar(self, vector: np.ndarray, criticos: tuple):
+        if not self.entradas:
+            return None
+        ids, distancias = self.index.knn_query(vector, k=1)
+        id_entrada, similitud = int(ids[0][0]), 1 - float(distancias[0][0])
+        if similitud < self.similitud_min or id_entrada not in self.entradas:
+            return None
+        analisis, criticos_cacheados, creado = self.entradas[id_entrada]
+        if time.monotonic() - creado > self.ttl:
+            self._eliminar(id_entrada)
+            return None
+        # La similitud sólo cubre el contexto (comorbilidades, síntomas, previos):
+        # las vitales, el laboratorio y la puntuación interna deben coincidir exactamente
+        if criticos_cacheados != criticos:
+            return None
+        return analisis
+
+    def agregar(self, vector: np.ndarray, analisis: dict, criticos: tuple):
+        if len(self.entradas) >= self.max_entradas:
+            self._purgar()
+        id_entrada = self.siguiente_id
+        self.siguiente_id += 1
+        self.index.add_items(vector.reshape(1, -1), np.array([id_entrada]), replace_deleted=True)
+        self.entradas[id_entrada] = (analisis, criticos, time.monotonic())
+
+
+semantic_cache = SemanticCache(EMBEDDING_DIM, CACHE_MAX_ENTRADAS, CACHE_SIMILITUD_MIN, CACHE_TTL_SEGUNDOS)
+
+# El índice semántico vive en la memoria de cada worker. Si se define REDIS_URL, además
+# se guarda cada análisis en Redis bajo la clave exacta del paciente (ya agrupada con
+# bin_vitals), de modo que todos los workers comparten los aciertos.
+REDIS_URL = os.getenv("REDIS_URL")
+REDIS_PREFIJO = "sepsia:analisis:"
+# Con timeouts cortos, un Redis caído se trata como un fallo de caché en lugar de
+# bloquear cada solicitud hasta el timeout TCP del sistema operativo
+REDIS_TIMEOUT_SEGUNDOS = float(os.getenv("REDIS_TIMEOUT_SEGUNDOS", "0.5"))
+redis_client = redis.from_url(
+    REDIS_URL,
+    socket_connect_timeout=REDIS_TIMEOUT_SEGUNDOS,
+    socket_timeout=REDIS_TIMEOUT_SEGUNDOS
+) if REDIS_URL else None
+
+
+def _clave_redis(clave: str) -> str:
+    return REDIS_PREFIJO + hashlib.sha256(clave.encode("utf-8")).hexdigest()
+
+
+async def buscar_en_cache(clave: str, criticos: tuple):
+    """
+    Busca primero en Redis (clave exacta) y luego en el índice semántico local.
+    Devuelve (vector, análisis), con análisis en None si no hubo acierto.
+    """
+    if redis_client is not None:
+        try:
+            valor = await redis_client.get(_clave_redis(clave))
+            if valor is not None:
+                return None, orjson.loads(valor)
+        except Exception as e:
+            print(f"Error al leer la caché compartida: {e}")
+
+    vector = await embed_patient(clave)
+    if vector is not None:
+        analisis = semantic_cache.buscar(vector, criticos)
+        if analisis is not None:
+            return vector, analisis
+    return vector, None
+
+
+async def guardar_en_cache(clave: str, criticos: tuple, vector, analisis: dict):
+    if vector is not None:
+        semantic_cache.agregar(vector, analisis, criticos)
+    if redis_client is not None:
+        try:
+            await redis_client.set(_clave_redis(clave), orjson.dumps(analisis), ex=CACHE_TTL_SEGUNDOS)
+        except Exception as e:
+            print(f"Error al escribir la caché compartida: {e}")
+
+# --- 5. Micro-batching ---
+# Bajo ráfagas de carga, las solicitudes que llegan dentro de una ventana corta se
+# agrupan en una sola llamada a Gemini que analiza varios pacientes a la vez.
+
+BATCH_WINDOW_MS = int(os.getenv("BATCH_WINDOW_MS", "20"))
+MAX_BATCH = int(os.getenv("MAX_BATCH", "8"))
+
+# Cada objeto del lote lleva el número de paciente, para no depender del orden del array
+BATCH_ITEM_SCHEMA = {
+    "type": "object",
+    "properties": {"paciente": {"type": "integer"}, **ANALYSIS_SCHEMA["properties"]},
+    "required": ["paciente", *ANALYSIS_SCHEMA["required"]],
+}
+batch_generation_config = genai.GenerationConfig(
+    temperature=0.2,
+    max_output_tokens=MAX_OUTPUT_TOKENS * MAX_BATCH,
+    response_mime_type="application/json",
+    response_schema={"type": "array", "items": BATCH_ITEM_SCHEMA}
+)
+
+PROMPT_LOTE_INSTRUCCIONES = """### FORMATO DE RESPUESTA PARA ESTE LOTE ###
+A continuación se envían {N} pacientes independientes. Analiza cada uno por separado siguiendo las instrucciones anteriores, pero en lugar de un único objeto responde con un array JSON de {N} objetos, uno por paciente, cada uno con la clave "paciente" (el número del encabezado "### PACIENTE N ###") y las claves "analisis_breve", "justificacion" y "acciones_sugeridas" (respetando los mismos límites de líneas).
+"""
+
+
+def build_patient_prompt(data: PatientData) -> str:
+    """
+    Rellena la parte variable del prompt (los datos del paciente).
+    """
+    # Formatear las variables estructuradas (JSON compacto, sin indentación)
+    comorbilidades_formateada = orjson.dumps(data.array_json_comorbilidades).decode()
+    valores_previos_formateados = orjson.dumps(data.objeto_json_valores_previos).decode()
+
+    # Rellenar la plantilla del prompt (sólo la parte variable; el prefijo ya está en el modelo)
+    return render_prompt_suffix(
+        FRECUENCIA_CARDIACA=data.frecuencia_cardiaca,
+        PRESION_ARTERIAL=data.presion_arterial,
+        FRECUENCIA_RESPIRATORIA=data.frecuencia_respiratoria,
+        TEMPERATURA_CORPORAL=data.temperatura_corporal,
+        SATURACION_OXIGENO=data.saturacion_oxigeno,
+        PROCALCITONINA=data.procalcitonina,
+        LACTATO=data.lactato,
+        PCR=data.pcr,
+        LEUCOCITOS=data.leucocitos,
+        ARRAY_JSON_COMORBILIDADES=comorbilidades_formateada,
+        TEXTO_PATOLOGIAS_PRESENTES=data.texto_patologias_presentes,
+        TEXTO_SINTOMAS_DIARIOS=data.texto_sintomas_diarios,
+        OBJETO_JSON_VALORES_PREVIOS=valores_previos_formateados,
+        PORCENTAJE_IA=data.porcentaje_ia
+    )
+
+
+def build_batch_prompt(pacientes: list[PatientData]) -> str:
+    """
+    Construye un único prompt con varios pacientes numerados.
+    """
+    partes = [PROMPT_LOTE_INSTRUCCIONES.format(N=len(pacientes))]
+    for i, data in enumerate(pacientes, start=1):
+        partes.append(f"### PACIENTE {i} ###\n{build_patient_prompt(data)}")
+    return "\n".join(partes)
+
+
+class RespuestaGeminiInvalida(ValueError):
+    """La respuesta de Gemini no es un JSON válido con los 3 campos del análisis."""
+
+
+def _cargar_json(text: str):
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError as e:
+        raise RespuestaGeminiInvalida(
+            f"Gemini devolvió un JSON inválido o truncado (límite de {MAX_OUTPUT_TOKENS} tokens por análisis): {e}"
+        ) from e
+
+
+def _normalizar_analisis(r) -> dict:
+    # Deja sólo los campos de AnalysisResponse, como strings sin espacios sobrantes
+    campos = ANALYSIS_SCHEMA["required"]
+    if not isinstance(r, dict) or any(not isinstance(r.get(campo), str) for campo in campos):
+        raise RespuestaGeminiInvalida(f"Faltan campos del análisis en la respuesta de Gemini: {str(r)[:200]}")
+    return {campo: r[campo].strip() for campo in campos}
+
+
+def parse_analysis_response(text: str) -> dict:
+    """
+    Convierte el JSON de un análisis individual en el dict de AnalysisResponse.
+    """
+    return _normalizar_analisis(_cargar_json(text))
+
+
+def parse_batch_response(text: str, cantidad: int) -> list[dict]:
+    """
+    Convierte el array JSON devuelto por Gemini en una lista de análisis, ordenada por
+    paciente. Cada análisis se asigna por su campo "paciente", no por su posición; si
+    falta alguno, se repite o está fuera de rango, se lanza ValueError.
+    """
+    resultados = _cargar_json(text)
+    if not isinstance(resultados, list) or len(resultados) != cantidad:
+        raise ValueError(f"Se esperaban {cantidad} análisis y se recibió: {text[:200]}")
+    por_paciente = {}
+    for r in resultados:
+        numero = r.get("paciente") if isinstance(r, dict) else None
+        if type(numero) is not int or not 1 <= numero <= cantidad or numero in por_paciente:
+            raise ValueError(f"Número de paciente inválido o repetido en la respuesta por lotes: {numero!r}")
+        por_paciente[numero] = _normalizar_analisis(r)
+    return [por_paciente[i] for i in range(1, cantidad + 1)]
+
+
+async def analizar_individual(data: PatientData) -> dict:
+    response = await llamar_gemini(build_patient_prompt(data))
+    return parse_analysis_response(response.text)
+
+
+async def analizar_lote(pacientes: list[PatientData]) -> list:
+    """
+    Analiza un lote con una sola llamada. Si la respuesta no se puede separar por
+    paciente, se recurre a una llamada individual por cada uno. Los errores de la
+    API de Gemini (cuota, red, etc.) no se reintentan por paciente: se propagan a
+    todas las solicitudes del lote.
+    """
+    if len(pacientes) == 1:
+        return [await analizar_individual(pacientes[0])]
+    response = await llamar_gemini(build_batch_prompt(pacientes), config=batch_generation_config)
+    try:
+        return parse_batch_response(response.text, len(pacientes))
+    except ValueError as e:
+        # Incluye RespuestaGeminiInvalida (JSON inválido, truncado o sin los campos esperados)
+        print(f"No se pudo separar la respuesta por lotes, se analiza cada paciente por separado: {e}")
+        return await asyncio.gather(*(analizar_individual(d) for d in pacientes), return_exceptions=True)
+
 
+class MicroBatcher:
+    """
+    Junta las solicitudes que llegan dentro de `ventana_ms` (o hasta `max_lote`)
+    y devuelve a cada una su análisis a través de un Future.
+    """
+
+    def __init__(self, ventana_ms: int, max_lote: int):
+        self.ventana = ventana_ms / 1000
+        self.max_lote = max_lote
+        self.cola = None
+        self.lleno = None
+        self.tarea = None
+        self.lotes_en_curso = set()
+
+    def _iniciar(self):
+        # Se crea dentro del event loop que atiende las solicitudes
+        self.cola = asyncio.Queue()
+        self.lleno = asyncio.Event()
+        self.tarea = asyncio.create_task(self._bucle())
+
+    async def analizar(self, data: PatientData) -> dict:
+        if self.tarea is None:
+            self._iniciar()
+        futuro = asyncio.get_running_loop().create_future()
+        self.cola.put_nowait((data, futuro))
+        # Despierta al bucle si con lo que hay en la cola (más el elemento que el lote en
+        # armado ya tomó) se completa un lote; el bucle vuelve a comprobarlo antes de enviar
+        if self.cola.qsize() + 1 >= self.max_lote:
+            self.lleno.set()
+        return await futuro
+
+    async def _bucle(self):
+        while True:
+            lote = [await self.cola.get()]
+            loop = asyncio.get_running_loop()
+            limite = loop.time() + self.ventana
+            # Sólo se espera mientras el lote (lo tomado más lo que sigue en la cola) no esté lleno
+            while len(lote) + self.cola.qsize() < self.max_lote:
+                restante = limite - loop.time()
+                if restante <= 0:
+                    break
+                self.lleno.clear()
+                try:
+                    await asyncio.wait_for(self.lleno.wait(), restante)
+                except asyncio.TimeoutError:
+                    break
+            while len(lote) < self.max_lote and not self.cola.empty():
+                lote.append(self.cola.get_nowait())
+
+            # El lote se procesa en segundo plano para poder seguir juntando el siguiente
+            tarea = asyncio.create_task(self._procesar(lote))
+            self.lotes_en_curso.add(tarea)
+            tarea.add_done_callback(self.lotes_en_curso.discard)
+
+    async def _procesar(self, lote: list):
+        try:
+            resultados = await analizar_lote([data for data, _ in lote])
+        except Exception as e:
+            resultados = [e] * len(lote)
+        for (_, futuro), resultado in zip(lote, resultados):
+            if futuro.done():
+                continue  # el cliente canceló la solicitud
+            if isinstance(resultado, BaseException):
+                futuro.set_exception(resultado)
+            else:
+                futuro.set_result(resultado)
+
+
+batcher = MicroBatcher(BATCH_WINDOW_MS, MAX_BATCH)
+
+
+# --- 6. El Endpoint de la API ---
+
+# Solicitudes en curso por clave de paciente: si llegan duplicados mientras la primera
+# espera a Gemini, todos esperan el mismo Future en lugar de repetir la llamada
+_inflight: dict[str, asyncio.Future] = {}
+
+
+async def analizar_paciente(data: PatientData) -> dict:
+    """
+    Devuelve el análisis del paciente desde la caché, desde una solicitud idéntica
+    que ya esté en curso o, si no hay ninguna, llamando a Gemini.
+    """
+    clave, criticos = claves_cache(data)
+    while (en_curso := _inflight.get(clave)) is not None:
+        try:
+            return await asyncio.shield(en_curso)
+        except asyncio.CancelledError:
+            # Si se canceló la solicitud líder (y no ésta), se vuelve a buscar o se pasa a ser líder
+            if not en_curso.cancelled():
+                raise
+
+    futuro = asyncio.get_running_loop().create_future()
+    _inflight[clave] = futuro
+    try:
+        vector, analisis = await buscar_en_cache(clave, criticos)
+        if analisis is None:
+            # Llamar a Gemini (agrupando solicitudes concurrentes en micro-lotes)
+            analisis = await batcher.analizar(data)
+            await guardar_en_cache(clave, criticos, vector, analisis)
+        futuro.set_result(analisis)
+        return analisis
+    except Exception as e:
+        futuro.set_exception(e)
+        futuro.exception()  # evita el aviso "exception was never retrieved" si nadie más esperaba
+        raise
+    finally:
+        _inflight.pop(clave, None)
+        if not futuro.done():
+            futuro.cancel()
+
+
+# Sin response_model: el JSON ya viene validado (esquema de Gemini y _normalizar_analisis),
+# así que se devuelve directamente un ORJSONResponse sin otra pasada de Pydantic.
+# AnalysisResponse se mantiene sólo para la documentación OpenAPI.
+@app.post("/analyze", responses={200: {"model": AnalysisResponse}})
+async def analyze_patient_endpoint(data: PatientData) -> ORJSONResponse:
+    """
+    Recibe los datos de un paciente, construye el prompt,
+    llama a la API de Gemini y devuelve un análisis estructurado.
+    """
+    try:
+        parsed_response = await analizar_paciente(data)
+        return ORJSONResponse(parsed_response)
+
+    except RespuestaGeminiInvalida as e:
+        print(f"Respuesta inválida de Gemini en /analyze: {e}")
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         print(f"Error en el endpoint /analyze_patient: {e}")
         raise HTTPException(status_code=500, detail=f"Error al procesar la solicitud: {str(e)}")
 
+# --- 7. Endpoint con Streaming (Server-Sent Events) ---
+# El cliente recibe cada fragmento de texto a medida que Gemini lo genera y cada campo
+# del análisis en cuanto se completa, sin esperar a que termine toda la respuesta.
+
+def _evento_sse(payload: dict) -> str:
+    return f"data: {orjson.dumps(payload).decode()}\n\n"
+
+
+@gemini_retry
+async def abrir_stream_gemini(contenido):
+    """
+    Toma un lugar de GEMINI_SEM y abre el stream. Si la apertura falla, el lugar se
+    libera antes de que tenacity espere para reintentar; si funciona, queda tomado y
+    quien llama debe liberarlo (GEMINI_SEM.release()) al terminar de consumir el stream.
+    Sólo se reintenta la apertura: una vez enviados fragmentos al cliente no se repite.
+    """
+    await GEMINI_SEM.acquire()
+    try:
+        return await model.generate_content_async(
+            contenido,
+            generation_config=generation_config,
+            safety_settings=safety_settings_config,
+            stream=True
+        )
+    except BaseException:
+        GEMINI_SEM.release()
+        raise
+
+
+async def stream_analysis_events(data: PatientData):
+    """
+    Genera los eventos SSE del análisis:
+    {"delta": ...} por cada fragmento, {"campo": ..., "valor": ...} por cada campo
+    completo del JSON, y {"fin": true} al terminar.
+    """
+    try:
+        clave, criticos = claves_cache(data)
+        vector, analisis_cacheado = await buscar_en_cache(clave, criticos)
+        if analisis_cacheado is not None:
+            for campo, valor in analisis_cacheado.items():
+                yield _evento_sse({"campo": campo, "valor": valor})
+            yield _evento_sse({"fin": True})
+            return
+
+        # ijson va parseando el JSON parcial y emite cada par clave/valor al completarse
+        campos_completos = ijson.sendable_list()
+        parser = ijson.kvitems_coro(campos_completos, "")
+        analisis = {}
+
+        # El lugar del semáforo se mantiene durante todo el stream, no sólo la llamada inicial
+        response = await abrir_stream_gemini(build_patient_prompt(data))
+        try:
+            async for chunk in response:
+                if not chunk.parts:
+                    continue
+                yield _evento_sse({"delta": chunk.text})
+                parser.send(chunk.text.encode("utf-8"))
+                for campo, valor in campos_completos:
+                    analisis[campo] = valor
+                    yield _evento_sse({"campo": campo, "valor": valor})
+                del campos_completos[:]
+        finally:
+            GEMINI_SEM.release()
+        parser.close()
+
+        # Sólo se cachea si el análisis completo pasa la misma validación que /analyze
+        try:
+            analisis_validado = _normalizar_analisis(analisis)
+        except RespuestaGeminiInvalida as e:
+            print(f"Respuesta incompleta en /analyze/stream, no se guarda en caché: {e}")
+        else:
+            await guardar_en_cache(clave, criticos, vector, analisis_validado)
+
+        yield _evento_sse({"fin": True})
+
+    except Exception as e:
+        # Los headers ya se enviaron, así que el error se informa como un evento más
+        print(f"Error en el endpoint /analyze/stream: {e}")
+        yield _evento_sse({"error": f"Error al procesar la solicitud: {str(e)}"})
+
+
+@app.post("/analyze/stream")
+async def analyze_patient_stream_endpoint(data: PatientData) -> StreamingResponse:
+    """
+    Igual que /analyze, pero devuelve el análisis como Server-Sent Events
+    a medida que Gemini lo va generando.
+    """
+    return StreamingResponse(
+        stream_analysis_events(data),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/")
 def read_root():
-    return {"message": "Bienvenido a la API de Análisis de Sepsis. Ve a /docs para probar."}
\ No newline at end of file
+    return {"message": "Bienvenido a la API de Análisis de Sepsis. Ve a /docs para probar."}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # El endpoint está limitado por I/O: varios workers (uno por núcleo por defecto)
+    # con uvloop y httptools. Con más de un worker conviene definir REDIS_URL para
+    # que la caché se comparta entre procesos.
+    uvicorn.run(
+        "main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8080")),
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        loop="uvloop",
+        http="httptools"
+    )